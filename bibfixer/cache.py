@@ -0,0 +1,75 @@
+import json
+import logging
+import os
+import time
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "bibfixer")
+
+logger = logging.getLogger(__name__)
+
+def _is_valid_store(data):
+    """Whether loaded JSON has the {key: {"value": ..., "expires": seconds}} shape save() writes."""
+    if not isinstance(data, dict):
+        return False
+    for record in data.values():
+        if not (
+            isinstance(record, dict)
+            and "value" in record
+            and isinstance(record.get("expires"), (int, float))
+        ):
+            return False
+    return True
+
+class JsonCache:
+    """
+    Small persistent key -> value store backed by a JSON file.
+    Values must be JSON-serializable and expire after their TTL (in seconds).
+    Changes are only written to disk by save().
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._dirty = False
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = None
+        if not _is_valid_store(data):
+            # Missing or corrupt cache: start empty, it is only an optimization.
+            data = {}
+        self._data = data
+
+    def get(self, key, default=None):
+        record = self._data.get(key)
+        if record is None:
+            return default
+        if record["expires"] < time.time():
+            del self._data[key]
+            self._dirty = True
+            return default
+        return record["value"]
+
+    def set(self, key, value, expire):
+        self._data[key] = {"value": value, "expires": time.time() + expire}
+        self._dirty = True
+
+    def save(self):
+        """Write the cache back to disk if it changed; a failed write is logged, not raised."""
+        if not self._dirty:
+            return
+        tmp_path = self.path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._data, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            # The cache is only an optimization: losing it must not fail the run.
+            logger.warning("Could not write cache %s: %s", self.path, e)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        self._dirty = False
@@ -1,5 +1,8 @@
 import re
-from unidecode import unidecode
+
+_WS_RE = re.compile(r"\s+")
+_DOI_URL_RE = re.compile(r'^(https?://(dx\.)?doi\.org/)', re.IGNORECASE)
+_DOI_PREFIX_RE = re.compile(r'^doi:\s*', re.IGNORECASE)
 
 def normalize_string(string):
     """Normalize strings to ascii, handling some latex/unicode issues."""
@@ -10,7 +13,12 @@ def normalize_string(string):
     # For now, let's just unidecode to ensure ASCII compatibility if that's desired, 
     # but strictly speaking bibtex supports utf8 now. The user said "clean them".
     # We will strip extra whitespaces.
-    string = re.sub(r"\s+", " ", string.strip())
+    # Fast path: most values are already clean, so return them without building a new string.
+    # isprintable() is False for every whitespace character except the ASCII space,
+    # so only single inner spaces can remain and there is nothing to collapse.
+    if string.isprintable() and "  " not in string and string[0] != " " and string[-1] != " ":
+        return string
+    string = _WS_RE.sub(" ", string.strip())
     return string
 
 def clean_entry(entry):
@@ -31,8 +39,8 @@ def clean_entry(entry):
     if 'doi' in cleaned:
         # Cleanup DOI: remove URL or "doi:" prefixes, normalize case.
         doi = cleaned['doi'].strip()
-        doi = re.sub(r'^(https?://(dx\.)?doi\.org/)', '', doi, flags=re.IGNORECASE)
-        doi = re.sub(r'^doi:\s*', '', doi, flags=re.IGNORECASE)
+        doi = _DOI_URL_RE.sub('', doi)
+        doi = _DOI_PREFIX_RE.sub('', doi)
         cleaned['doi'] = doi.lower()
         
     return cleaned
@@ -41,8 +49,5 @@ def clean_database(database):
     """
     Apply cleaning to all entries in the database.
     """
-    cleaned_entries = []
-    for entry in database.entries:
-        cleaned_entries.append(clean_entry(entry))
-    database.entries = cleaned_entries
+    database.entries = [clean_entry(entry) for entry in database.entries]
     return database
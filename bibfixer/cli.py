@@ -1,15 +1,29 @@
 import argparse
 from .core import fix_bibliography
+from .enricher import DEFAULT_WORKERS
 
 def main():
     parser = argparse.ArgumentParser(description="Fix and enrich bibliography files.")
     parser.add_argument('input_file', help="Path to input .bib file")
     parser.add_argument('-o', '--output', help="Path to output .bib file", default=None)
     parser.add_argument('--verify', action='store_true', help="Emit DOI verification details")
+    parser.add_argument('-w', '--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f"Number of concurrent DOI lookups (default: {DEFAULT_WORKERS})")
+    parser.add_argument('--no-cache', action='store_true', help="Do not read or write the Crossref response cache")
+    parser.add_argument('--refresh-cache', action='store_true', help="Query Crossref again and update the cache")
     
     args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
     
-    fix_bibliography(args.input_file, args.output, verify=args.verify)
+    fix_bibliography(
+        args.input_file,
+        args.output,
+        verify=args.verify,
+        workers=args.workers,
+        use_cache=not args.no_cache,
+        refresh_cache=args.refresh_cache,
+    )
 
 if __name__ == "__main__":
     main()
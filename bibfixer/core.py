@@ -1,18 +1,23 @@
 from .io import load_bib, save_bib
-from .cleaner import clean_database
-from .enricher import enrich_database
+from .cleaner import clean_entry
+from .enricher import DEFAULT_WORKERS, enrich_database
+from .cache import DEFAULT_CACHE_DIR, JsonCache
 from .validator import validate_database
-from .deduplicator import uniquify_keys, check_fuzzy_duplicates, deduplicate_database
+from .deduplicator import uniquify_and_index, check_fuzzy_duplicates, deduplicate_database, strip_private_fields
 from tqdm import tqdm
 import os
 
-def fix_bibliography(input_file, output_file=None, verify=False):
+def fix_bibliography(input_file, output_file=None, verify=False, workers=DEFAULT_WORKERS,
+                     use_cache=True, refresh_cache=False):
     """
     Main function to fix a bibliography file.
     
     Args:
         input_file (str): Path to input .bib file.
         output_file (str): Path to output .bib file.
+        workers (int): Number of concurrent DOI lookups.
+        use_cache (bool): Reuse Crossref responses cached by earlier runs.
+        refresh_cache (bool): Query Crossref again and overwrite cached responses.
     """
     if output_file is None:
         if input_file.endswith('.bib'):
@@ -20,8 +25,9 @@ def fix_bibliography(input_file, output_file=None, verify=False):
         else:
             output_file = input_file + '_fix.bib'
 
-    print(f"Loading {input_file}...")
-    db = load_bib(input_file)
+    print(f"Loading and cleaning {input_file}...")
+    # Entries are cleaned as the parser emits them, saving a second pass over the database.
+    db = load_bib(input_file, customization=clean_entry)
     print(f"Loaded {len(db.entries)} entries.")
     
     # Validation before
@@ -33,28 +39,33 @@ def fix_bibliography(input_file, output_file=None, verify=False):
     #     if len(warnings_before) > 10:
     #         print(f"  ... and {len(warnings_before) - 10} more.")
 
-    print("Cleaning entries...")
-    db = clean_database(db)
-    
     print("Uniquifying keys (renaming initial ID collisions)...")
-    db, renamed_count = uniquify_keys(db)
+    # Fingerprints for deduplication are collected in the same pass.
+    db, renamed_count, dedup_indices = uniquify_and_index(db)
     if renamed_count > 0:
         print(f"Renamed {renamed_count} duplicate keys to ensure uniqueness.")
 
     print("Smart deduplicating (merging certain duplicates)...")
-    db, merges = deduplicate_database(db)
+    # Near-identical titles that are not safe to merge are only reported, below.
+    near_duplicates = []
+    db, merges = deduplicate_database(db, indices=dedup_indices, near_duplicates=near_duplicates)
     merged_count = sum(len(m[1]) for m in merges)
     if merged_count > 0:
         print(f"Merged and removed {merged_count} duplicate entries.")
 
     print("Enriching with DOIs (this may take a while)...")
-    db, enriched_items, verify_log = enrich_database(db, pbar=tqdm, verify=verify)
+    # Crossref responses from earlier runs are reused instead of queried again.
+    crossref_cache = JsonCache(os.path.join(DEFAULT_CACHE_DIR, "crossref.json")) if use_cache else None
+    db, enriched_items, verify_log = enrich_database(
+        db, pbar=tqdm, verify=verify, workers=workers,
+        cache=crossref_cache, refresh_cache=refresh_cache,
+    )
     print(f"Added/Updated DOIs for {len(enriched_items)} entries.")
     
     # Validation after
     warnings = validate_database(db)
     # Check fuzzy too
-    fuzzy_warnings = check_fuzzy_duplicates(db)
+    fuzzy_warnings = check_fuzzy_duplicates(db, near_duplicates=near_duplicates)
     warnings.extend(fuzzy_warnings)
     
     if warnings:
@@ -65,7 +76,11 @@ def fix_bibliography(input_file, output_file=None, verify=False):
             print(f"  ... and {len(warnings) - 10} more.")
             
     print(f"Saving to {output_file}...")
+    db = strip_private_fields(db)
     save_bib(db, output_file)
+    # After the output is written, so a cache that cannot be saved never costs the .bib.
+    if crossref_cache is not None:
+        crossref_cache.save()
     
     # Generate Report
     report_lines = []
@@ -1,11 +1,51 @@
+import array
+import functools
+import hashlib
+import re
 from collections import defaultdict
-from unidecode import unidecode
+from rapidfuzz import fuzz, process
+from rapidfuzz.distance import Levenshtein
+try:
+    # ASCII fast path: skips the transliteration tables when the text is already ASCII.
+    from unidecode import unidecode_expect_ascii as unidecode
+except ImportError:  # older unidecode releases
+    from unidecode import unidecode
+
+_NONALNUM_RE = re.compile(r'[^a-z0-9]+')
+
+# MinHash/LSH settings for near-duplicate titles in check_fuzzy_duplicates.
+# 16 bands of 2 rows flag pairs whose 3-word shingle Jaccard similarity is
+# above roughly 0.3; candidates are then verified with rapidfuzz's edit-distance ratio.
+_LSH_BANDS = 16
+_LSH_ROWS = 2
+_MINHASH_SIZE = _LSH_BANDS * _LSH_ROWS
+_NEAR_DUPLICATE_SCORE = 90
+
+# deduplicate_database also considers entries whose titles differ slightly when the
+# first author (prefix) and year agree. token_sort_ratio tolerates reordered words
+# but, unlike token_set_ratio, does not score a title's word subset as a match.
+# A high score alone is not enough to merge: "Part I"/"Part II" or "noisy"/"noiseless"
+# score above the cutoff too, so see _safe_to_merge.
+_BLOCK_AUTHOR_PREFIX = 4
+_BLOCK_MERGE_SCORE = 92
+# Character edits between titles that still count as a typo of the same title.
+_TYPO_EDITS = 2
+# Numbers ("2019", "wmt19") and roman numerals ("part ii") that tell papers in a series apart.
+_DIGITS_RE = re.compile(r'\d+')
+_ROMAN_RE = re.compile(r'^m{0,4}(cm|cd|d?c{0,3})(xc|xl|l?x{0,3})(ix|iv|v?i{0,3})$')
+
+# Scratch fields stored on entries during dedup; strip them before saving.
+PRIVATE_FIELD_PREFIX = '_bibfix_'
+SIMPLE_TITLE_FIELD = PRIVATE_FIELD_PREFIX + 'simple_title'
+
+@functools.lru_cache(maxsize=65536)
+def _cached_norm(text):
+    # Years, author names and DOIs repeat a lot across entries; memoize the transliteration.
+    return unidecode(text).lower().strip()
 
 def normalize_key_text(text):
     """Normalize text for key generation/comparison."""
-    if not text:
-        return ""
-    return unidecode(text).lower().strip()
+    return _cached_norm(text) if text else ""
 
 def get_entry_fingerprint(entry):
     """
@@ -14,34 +54,39 @@ def get_entry_fingerprint(entry):
         doi_fp: DOI string (or None)
         content_fp: Tuple of (Title, Author, Year) (or None)
     """
+    entry_get = entry.get
+
     # 1. DOI Fingerprint
     doi_fp = None
-    if 'doi' in entry and entry['doi'].strip():
-        doi_fp = normalize_key_text(entry['doi'])
+    doi = entry_get('doi')
+    if doi and doi.strip():
+        doi_fp = normalize_key_text(doi)
         
     # 2. Content Fingerprint
+    # We need at least Title + (Author OR Year) to be reasonably certain,
+    # so skip normalizing author/year when the title alone rules it out.
     content_fp = None
-    title = normalize_key_text(entry.get('title', ''))
+    title = normalize_key_text(entry_get('title'))
+    if len(title) <= 10:
+        return doi_fp, content_fp
+
     # Extract first author
-    author_str = normalize_key_text(entry.get('author', ''))
-    year = normalize_key_text(entry.get('year', ''))
+    author_str = normalize_key_text(entry_get('author'))
+    year = normalize_key_text(entry_get('year'))
     
-    # We need at least Title + (Author OR Year) to be reasonably certain
-    if title and len(title) > 10 and (author_str or year):
+    if author_str or year:
         # Simplify title (remove non-alphanumeric)
-        simple_title = "".join(filter(str.isalnum, title))
+        simple_title = _NONALNUM_RE.sub('', title)
         
         # Simplify author (just first author's last name roughly)
         # "smith, john and doe, jane" -> "smith"
         simple_author = ""
         if author_str:
-            parts = author_str.split(' and ')
-            if parts:
-                first_part = parts[0] # "smith, john"
-                if ',' in first_part:
-                    simple_author = first_part.split(',')[0].strip()
-                else:
-                    simple_author = first_part.split(' ')[-1].strip() # "john smith" -> "smith"
+            first_part = author_str.split(' and ', 1)[0] # "smith, john"
+            if ',' in first_part:
+                simple_author = first_part.split(',', 1)[0].strip()
+            else:
+                simple_author = first_part.rsplit(' ', 1)[-1].strip() # "john smith" -> "smith"
         
         content_fp = (simple_title, simple_author, year)
         
@@ -56,90 +101,207 @@ def merge_entries(entries):
     master = entries[0]
     for other in entries[1:]:
         for key, value in other.items():
+            if key.startswith(PRIVATE_FIELD_PREFIX):
+                # Derived from the other entry's own fields; never carry it over.
+                continue
             if key not in master or not master[key]:
                 master[key] = value
             # Note: We don't overwrite master's non-empty values. 
             # This generally keeps the "first" entry's values, which is usually safe.
     return master
 
-def deduplicate_database(database):
+def _add_to_group(groups, fp, entry_id):
+    # Most fingerprints are unique: store the bare ID and only promote to a list on a collision.
+    prev = groups.get(fp)
+    if prev is None:
+        groups[fp] = entry_id
+    elif isinstance(prev, str):
+        groups[fp] = [prev, entry_id]
+    else:
+        prev.append(entry_id)
+
+def _index_entry(entry, indices):
+    """Add one entry to the fingerprint indices built by fingerprint_entries."""
+    doi_groups, content_groups, entry_dois, block_groups = indices
+    entry_id = entry['ID']
+    doi_fp, content_fp = get_entry_fingerprint(entry)
+
+    if doi_fp:
+        entry_dois[entry_id] = doi_fp
+        _add_to_group(doi_groups, doi_fp, entry_id)
+    if content_fp:
+        # Cache the simplified title for check_fuzzy_duplicates
+        entry[SIMPLE_TITLE_FIELD] = content_fp[0]
+        _add_to_group(content_groups, content_fp, entry_id)
+
+        _, simple_author, year = content_fp
+        if simple_author and year:
+            title_text = _NONALNUM_RE.sub(' ', normalize_key_text(entry['title'])).strip()
+            block = block_groups[(simple_author[:_BLOCK_AUTHOR_PREFIX], year)]
+            # Identical titles by the same first author share one slot, so each is scored once.
+            block.setdefault((title_text, _first_author(entry)), []).append(entry_id)
+
+def _new_indices():
+    """Empty (doi_groups, content_groups, entry_dois, block_groups), as fingerprint_entries returns."""
+    return {}, {}, {}, defaultdict(dict)
+
+def fingerprint_entries(entries):
+    """
+    Group entry IDs by fingerprint in a single pass.
+    Group values are a single ID, or a list of IDs once a fingerprint is shared.
+    Returns a tuple of:
+        doi_groups: {doi_fp: id or [ids]}
+        content_groups: {content_fp: id or [ids]}
+        entry_dois: {id: doi_fp} for entries that have a DOI
+        block_groups: {(author_prefix, year): {(title_text, first_author): [ids]}} for fuzzy title matching
+    """
+    indices = _new_indices()
+    for entry in entries:
+        _index_entry(entry, indices)
+    return indices
+
+class DisjointSet:
+    """Union-find over entry IDs, with path compression."""
+
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, item):
+        parent = self.parent
+        root = parent.setdefault(item, item)
+        while parent[root] != root:
+            root = parent[root]
+        # Compress the path so later lookups are O(1)
+        while parent[item] != root:
+            parent[item], item = root, parent[item]
+        return root
+
+    def union(self, a, b):
+        """Join the sets of `a` and `b`; returns the new root."""
+        root_a = self.find(a)
+        root_b = self.find(b)
+        if root_a != root_b:
+            self.parent[root_b] = root_a
+        return root_a
+
+def _join_if_compatible(dsu, component_doi, entry_dois, ids):
+    """Join `ids` into one component unless that would put two different DOIs together."""
+    roots = {dsu.find(eid) for eid in ids}
+    if len(roots) < 2:
+        return
+    dois = {component_doi.get(root) or entry_dois.get(root) for root in roots}
+    dois.discard(None)
+    if len(dois) > 1:
+        return
+    root = ids[0]
+    for eid in ids[1:]:
+        root = dsu.union(root, eid)
+    if dois:
+        component_doi[root] = dois.pop()
+
+def _numbering(title_text):
+    """Numbers and roman numerals in a normalized title, in order."""
+    numbers = _DIGITS_RE.findall(title_text)
+    numbers.extend(word for word in title_text.split() if _ROMAN_RE.match(word))
+    return numbers
+
+def _first_author(entry):
+    author_str = normalize_key_text(entry.get('author'))
+    return _NONALNUM_RE.sub('', author_str.split(' and ', 1)[0])
+
+def _same_field(value_a, value_b):
+    return bool(value_a) and value_a == value_b
+
+def _safe_to_merge(title_a, title_b, entry_a, entry_b):
+    """
+    Whether two entries whose titles only nearly match are the same work: the titles
+    are a typo apart and carry the same numbering, and the full first-author name agrees.
+    A shared venue or pages is not enough ("noisy"/"noiseless" at the same conference).
+    """
+    if _numbering(title_a) != _numbering(title_b):
+        return False
+    return (
+        _same_field(_first_author(entry_a), _first_author(entry_b))
+        and Levenshtein.distance(title_a, title_b, score_cutoff=_TYPO_EDITS) <= _TYPO_EDITS
+    )
+
+def deduplicate_database(database, indices=None, near_duplicates=None):
     """
     Identify and merge duplicates.
+    Entries sharing a DOI or a content fingerprint are joined transitively,
+    so A == B (by DOI) and B == C (by content) merges all three.
+    Within each (first-author prefix, year) block, near-identical titles are joined too,
+    when _safe_to_merge agrees; other near-identical pairs are appended to the
+    `near_duplicates` list (if given) as (id, id) for check_fuzzy_duplicates to report.
+    Pass `indices` from uniquify_and_index to skip re-reading the entries.
     Returns:
         database: Modified database
-        merged_count: Number of entries removed via merging
+        merges: List of (master_id, [merged_ids])
     """
-    # Group by fingerprints
-    doi_groups = defaultdict(list)
-    content_groups = defaultdict(list)
-    
-    entries_by_id = {}
-    
     # First pass: Build indices
-    for entry in database.entries:
-        entries_by_id[entry['ID']] = entry
-        doi_fp, content_fp = get_entry_fingerprint(entry)
-        
-        if doi_fp:
-            doi_groups[doi_fp].append(entry['ID'])
-        if content_fp:
-            content_groups[content_fp].append(entry['ID'])
-            
-    ids_to_remove = set()
-    merged_count = 0
-    
-    # Process DOI groups first (strongest signal)
-    # We want to form sets of IDs that are duplicates
-    # This is a disjoint set problem effectively, but let's simplify.
-    # Since we are modifying the list at the end, we just track "master" and "removed".
-    
-    merges = [] # List of (master_id, [merged_ids])
-
-    # Helper to process a group of IDs
-    def process_group(group_ids, allow_conflicting_dois):
-        # Filter out already removed
-        valid_ids = [eid for eid in group_ids if eid not in ids_to_remove]
-        if len(valid_ids) < 2:
-            return 0
-            
-        # We found valid duplicates!
-        # Sort them to be deterministic? Or just take first.
-        # Let's take the one with the most fields as master?
-        # For now, just taking the first one in the list order is fine.
-        
-        master_id = valid_ids[0]
-        duplicates_to_merge = [entries_by_id[eid] for eid in valid_ids]
-        if not allow_conflicting_dois:
-            dois = {
-                normalize_key_text(entry.get("doi", ""))
-                for entry in duplicates_to_merge
-                if entry.get("doi", "").strip()
-            }
-            if len(dois) > 1:
-                return 0
-        
-        # Merge
-        merge_entries(duplicates_to_merge)
-        
-        # Record the merge
-        removed_ids = valid_ids[1:]
-        merges.append((master_id, removed_ids))
+    if indices is None:
+        indices = fingerprint_entries(database.entries)
+    doi_groups, content_groups, entry_dois, block_groups = indices
 
-        # Mark others for removal
-        for eid in removed_ids:
-            ids_to_remove.add(eid)
-            
-        return len(removed_ids)
+    dsu = DisjointSet()
+    # DOI carried by each component (keyed by root); a component never holds two.
+    component_doi = {}
 
-    # Check DOI groups
+    # DOI groups first (strongest signal): always join.
     for doi, ids in doi_groups.items():
-        if len(ids) > 1:
-            merged_count += process_group(ids, allow_conflicting_dois=True)
+        if isinstance(ids, list):
+            root = ids[0]
+            for eid in ids[1:]:
+                root = dsu.union(root, eid)
+            component_doi[root] = doi
             
-    # Check Content groups
+    # Content groups: join unless that would put two different DOIs together.
     for fp, ids in content_groups.items():
-        if len(ids) > 1:
-            merged_count += process_group(ids, allow_conflicting_dois=False)
+        if isinstance(ids, list):
+            _join_if_compatible(dsu, component_doi, entry_dois, ids)
+
+    # Blocks: only titles sharing an author prefix and year are compared, never all pairs.
+    entries_by_id = None
+    for block in block_groups.values():
+        # Identical titles with the same full first author are joined outright. The prefix
+        # alone ("smit") also blocks "Smithson" with "Smith", so identical titles with
+        # different first authors are scored below and go through _safe_to_merge.
+        for ids in block.values():
+            if len(ids) > 1:
+                _join_if_compatible(dsu, component_doi, entry_dois, ids)
+        slots = list(block)
+        titles = [title_text for title_text, _ in slots]
+        for i in range(len(titles) - 1):
+            matches = process.extract(
+                titles[i], titles[i + 1:], scorer=fuzz.token_sort_ratio,
+                score_cutoff=_BLOCK_MERGE_SCORE, limit=None,
+            )
+            for other_title, _, offset in matches:
+                if entries_by_id is None:
+                    entries_by_id = {entry['ID']: entry for entry in database.entries}
+                ids_a = block[slots[i]]
+                ids_b = block[slots[i + 1 + offset]]
+                if _safe_to_merge(titles[i], other_title, entries_by_id[ids_a[0]], entries_by_id[ids_b[0]]):
+                    _join_if_compatible(dsu, component_doi, entry_dois, ids_a + ids_b)
+                elif near_duplicates is not None:
+                    near_duplicates.append((ids_a[0], ids_b[0]))
+
+    # Collect components in database order: the first-seen entry is the master.
+    components = defaultdict(list)
+    for entry in database.entries:
+        entry_id = entry['ID']
+        if entry_id in dsu.parent:
+            components[dsu.find(entry_id)].append(entry)
+
+    merges = [] # List of (master_id, [merged_ids])
+    ids_to_remove = set()
+    for members in components.values():
+        if len(members) < 2:
+            continue
+        merge_entries(members)
+        removed_ids = [e['ID'] for e in members[1:]]
+        merges.append((members[0]['ID'], removed_ids))
+        ids_to_remove.update(removed_ids)
             
     # Rebuild database entries list
     if ids_to_remove:
@@ -148,64 +310,156 @@ def deduplicate_database(database):
         
     return database, merges
 
-def uniquify_keys(database):
-    """
-    Ensure all keys in the database are unique.
-    Renames duplicates by appending _a, _b, etc.
-    """
+def _unique_key(original_key, existing_keys, next_suffix):
+    """Return a key not in `existing_keys`, appending _a.._z, then _2.._N, to `original_key`."""
+    if original_key not in existing_keys:
+        return original_key
+    # Resume from the last suffix tried for this key, so repeated collisions don't re-probe _a, _b, ...
+    n = next_suffix[original_key]
+    while True:
+        if n < 26:
+            candidate = f"{original_key}_{chr(97 + n)}"
+        else:
+            candidate = f"{original_key}_{n - 24}"
+        n += 1
+        if candidate not in existing_keys:
+            break
+    next_suffix[original_key] = n
+    return candidate
+
+def _uniquify(database, indices=None):
+    """Rename colliding keys in one pass, adding each entry to `indices` if given."""
     existing_keys = set()
+    next_suffix = defaultdict(int)
     renamed_count = 0
-    
+
     for entry in database.entries:
-        original_key = entry['ID']
-        new_key = original_key
-        
-        if new_key in existing_keys:
-            # Generate a unique key
-            # Try _a, _b...
-            suffix_char_code = 97 # 'a'
-            suffix_num = 2
-            
-            # Formulate a unique key
-            # Logic: try _a..._z, then _2..._N
-            
-            candidate = f"{original_key}_{chr(suffix_char_code)}"
-            while candidate in existing_keys:
-                suffix_char_code += 1
-                if suffix_char_code > 122: # 'z'
-                     # Switch to numbers
-                     candidate = f"{original_key}_{suffix_num}"
-                     suffix_num += 1
-                else:
-                    candidate = f"{original_key}_{chr(suffix_char_code)}"
-            
-            new_key = candidate
+        new_key = _unique_key(entry['ID'], existing_keys, next_suffix)
+        if new_key != entry['ID']:
             entry['ID'] = new_key
             renamed_count += 1
-            
         existing_keys.add(new_key)
-        
-    return database, renamed_count
+        if indices is not None:
+            _index_entry(entry, indices)
+
+    return renamed_count
 
-def check_fuzzy_duplicates(database):
+def uniquify_keys(database):
+    """
+    Ensure all keys in the database are unique.
+    Renames duplicates by appending _a, _b, etc.
+    """
+    return database, _uniquify(database)
+
+def uniquify_and_index(database):
+    """
+    uniquify_keys and fingerprint_entries fused into one pass over the entries.
+    Returns:
+        database: Database with unique keys
+        renamed_count: Number of renamed entries
+        indices: Fingerprint indices, to pass to deduplicate_database
+    """
+    indices = _new_indices()
+    return database, _uniquify(database, indices), indices
+
+def title_shingles(words, size=3):
+    """Set of `size`-word shingles; short titles yield a single shingle."""
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def minhash_signature(shingles):
+    """MinHash signature of a shingle set, using deterministic hashes."""
+    # One BLAKE2b digest per shingle supplies all _MINHASH_SIZE 16-bit hash values,
+    # so the only per-shingle Python work is a single hash call.
+    digest_size = 2 * _MINHASH_SIZE
+    rows = [
+        array.array('H', hashlib.blake2b(shingle.encode(), digest_size=digest_size).digest())
+        for shingle in shingles
+    ]
+    return list(map(min, zip(*rows)))
+
+def lsh_bands(signature):
+    """Bucket keys for a signature: one int per band, packing the band number and its rows."""
+    keys = []
+    for band in range(_LSH_BANDS):
+        key = band
+        for value in signature[band * _LSH_ROWS:(band + 1) * _LSH_ROWS]:
+            key = (key << 16) | value
+        keys.append(key)
+    return keys
+
+def _find_near_duplicate(title_text, bands, buckets, titles):
+    """Return the key of the closest earlier title sharing an LSH band, if it is similar enough."""
+    candidates = {}
+    for band_key in bands:
+        ids = buckets.get(band_key)
+        if ids is None:
+            continue
+        for prev_key in ([ids] if isinstance(ids, str) else ids):
+            candidates[prev_key] = titles[prev_key]
+    if not candidates:
+        return None
+    # Scores every candidate in C++ rather than running a Python-level edit-distance loop.
+    match = process.extractOne(title_text, candidates, scorer=fuzz.ratio, score_cutoff=_NEAR_DUPLICATE_SCORE)
+    if match is None or match[1] <= _NEAR_DUPLICATE_SCORE:
+        return None
+    return match[2]
+
+def check_fuzzy_duplicates(database, near_duplicates=()):
     """
     Check for entries that look similar but were NOT merged (maybe different year? or slight typo).
     This logic is partly redundant with deduplicate_database but useful as a safety check or for weaker matches.
+    Pairs that deduplicate_database collected in `near_duplicates` are reported first.
+    Identical simplified titles are reported directly; near-identical ones are found
+    through MinHash/LSH buckets, so titles are never compared all-pairs.
     """
     warnings = []
+    present = {entry['ID'] for entry in database.entries} if near_duplicates else ()
+    reported = set()
+    for key, prev_key in near_duplicates:
+        # Either side may have been merged into another entry since.
+        if key in present and prev_key in present:
+            reported.add(frozenset((key, prev_key)))
+            warnings.append(
+                f"Possible duplicate (not merged): '{key}' and '{prev_key}' have nearly identical titles "
+                "but differ in numbering or details."
+            )
     seen_titles = {}
+    buckets = {} # band key -> key or [keys], as in fingerprint_entries' groups
+    titles = {} # key -> title_text, for keys in buckets
     
     for entry in database.entries:
         if 'title' not in entry: continue
-        title = normalize_key_text(entry['title'])
-        simple_title = "".join(filter(str.isalnum, title))
+        simple_title = entry.get(SIMPLE_TITLE_FIELD) or _NONALNUM_RE.sub('', normalize_key_text(entry['title']))
         if len(simple_title) < 15: continue
             
         key = entry['ID']
         if simple_title in seen_titles:
             prev_key = seen_titles[simple_title]
-            warnings.append(f"Possible duplicate (not merged): '{key}' and '{prev_key}' have similar titles.")
-        else:
-            seen_titles[simple_title] = key
+            if frozenset((key, prev_key)) not in reported:
+                warnings.append(f"Possible duplicate (not merged): '{key}' and '{prev_key}' have similar titles.")
+            continue
+        seen_titles[simple_title] = key
+
+        words = _NONALNUM_RE.sub(' ', normalize_key_text(entry['title'])).split()
+        title_text = " ".join(words)
+        bands = lsh_bands(minhash_signature(title_shingles(words)))
+
+        prev_key = _find_near_duplicate(title_text, bands, buckets, titles)
+        if prev_key is not None and frozenset((key, prev_key)) not in reported:
+            warnings.append(f"Possible near-duplicate (not merged): '{key}' and '{prev_key}' have nearly identical titles.")
+
+        titles[key] = title_text
+        for band_key in bands:
+            _add_to_group(buckets, band_key, key)
             
     return warnings
+
+def strip_private_fields(database):
+    """Remove the scratch fields added during deduplication."""
+    database.entries = [
+        {key: value for key, value in entry.items() if not key.startswith(PRIVATE_FIELD_PREFIX)}
+        for entry in database.entries
+    ]
+    return database
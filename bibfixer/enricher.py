@@ -1,8 +1,168 @@
+import functools
+import hashlib
+import logging
+import os
 import requests
 import re
-from difflib import SequenceMatcher
+import threading
+import time
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from rapidfuzz import fuzz, utils
 from unidecode import unidecode
 
+_DOI_URL_RE = re.compile(r"^(https?://(dx\.)?doi\.org/)", re.IGNORECASE)
+_DOI_PREFIX_RE = re.compile(r"^doi:\s*", re.IGNORECASE)
+_DOI_VALID_RE = re.compile(r"^10\.\d{4,9}/\S+$")
+_PAGES_RE = re.compile(r"[^0-9\-]")
+_YEAR_RE = re.compile(r"\d{4}")
+# normalize_text output is lowercase ASCII, so deleting the other ASCII characters
+# leaves exactly [a-z0-9].
+_AUTHOR_DELETE = str.maketrans("", "", "".join(
+    chr(c) for c in range(128) if not (chr(c).isdigit() or "a" <= chr(c) <= "z")
+))
+
+# Concurrent Crossref lookups; kept modest to stay within the API's rate limits.
+DEFAULT_WORKERS = 8
+
+logger = logging.getLogger(__name__)
+
+# Crossref routes requests that identify a contact address to its "polite" pool,
+# which has higher rate limits than anonymous traffic.
+MAILTO = os.environ.get("BIBFIXER_MAILTO", "").strip()
+if MAILTO:
+    USER_AGENT = f"BibFixer/1.0 (+https://github.com/NathWolf/BibFix; mailto:{MAILTO})"
+else:
+    USER_AGENT = "BibFixer/1.0 (+https://github.com/NathWolf/BibFix)"
+_mailto_warned = False
+
+# Keep-alive connections kept per host by a session; enough for the default workers.
+SESSION_POOL_SIZE = 16
+
+def create_session(pool_size=SESSION_POOL_SIZE):
+    """
+    Build a requests.Session for Crossref: pooled keep-alive connections, and
+    automatic backoff on 429/5xx responses that honours Retry-After.
+    `pool_size` should be at least the number of threads sharing the session.
+    """
+    session = requests.Session()
+    session.headers.update({'User-Agent': USER_AGENT})
+    # Only rate-limit and server errors get the long backoff. Connection and read
+    # failures are retried once (immediately), so an unreachable or slow Crossref
+    # fails each lookup in one timeout instead of a minute of sleeps.
+    retry = Retry(
+        total=5,
+        connect=1,
+        read=1,
+        backoff_factor=2,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET"],
+        respect_retry_after_header=True,
+    )
+    session.mount("https://", HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry))
+    return session
+
+# Shared by every lookup that is not given its own session, so TLS connections are reused.
+_SESSION = create_session()
+
+CROSSREF_WORKS_URL = "https://api.crossref.org/works"
+
+# Item fields used for matching; Crossref is asked (via select=) to return only these.
+CROSSREF_FIELDS = (
+    "DOI", "title", "author", "issued", "published-print", "published-online",
+    "container-title", "volume", "issue", "page",
+)
+
+class RateLimiter:
+    """
+    Thread-safe token bucket: at most `limit` requests per `interval` seconds.
+    Crossref announces its current limit in X-Rate-Limit-* response headers;
+    update_from_headers() adopts it so the workers never outrun the API.
+    """
+
+    def __init__(self, limit=50, interval=1.0):
+        self._lock = threading.Lock()
+        self.limit = limit
+        self.interval = interval
+        self._tokens = float(limit)
+        self._updated = time.monotonic()
+
+    def _refill(self, now):
+        rate = self.limit / self.interval
+        self._tokens = min(self.limit, self._tokens + (now - self._updated) * rate)
+        self._updated = now
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) * self.interval / self.limit
+            time.sleep(wait)
+
+    def update_from_headers(self, headers):
+        try:
+            limit = int(headers["X-Rate-Limit-Limit"])
+            interval = float(headers["X-Rate-Limit-Interval"].rstrip("s"))
+        except (KeyError, ValueError):
+            return
+        if limit < 1 or interval <= 0:
+            return
+        with self._lock:
+            if (limit, interval) != (self.limit, self.interval):
+                self._refill(time.monotonic())
+                self.limit = limit
+                self.interval = interval
+                self._tokens = min(self._tokens, limit)
+
+# Shared by every Crossref request so the rate limit holds across all workers.
+_RATE_LIMITER = RateLimiter()
+
+def _crossref_get(params, session=None, errors=None):
+    """
+    GET the Crossref /works endpoint through the shared rate limiter,
+    asking only for CROSSREF_FIELDS.
+    Returns the decoded JSON message, or None if the request failed.
+    A failure is appended to the `errors` list if given, and logged otherwise.
+    """
+    params["select"] = ",".join(CROSSREF_FIELDS)
+    if MAILTO:
+        params["mailto"] = MAILTO
+    http = session if session is not None else _SESSION
+    _RATE_LIMITER.acquire()
+    try:
+        response = http.get(CROSSREF_WORKS_URL, params=params, timeout=10)
+        _RATE_LIMITER.update_from_headers(response.headers)
+        if response.status_code == 200:
+            return response.json().get('message', {})
+        error = f"HTTP {response.status_code}"
+    except requests.RequestException as e:
+        # str(e) quotes the request URL, and with it the mailto address; keep only the cause.
+        reason = getattr(e.args[0], "reason", None) if e.args else None
+        error = f"{type(e).__name__}: {reason}" if reason else type(e).__name__
+    except ValueError:
+        error = "response is not valid JSON"
+    if errors is None:
+        logger.warning("Crossref request failed: %s", error)
+    else:
+        errors.append(error)
+    return None
+
+# Title similarity needed to accept a candidate, and to stop looking at further candidates.
+MIN_TITLE_SIMILARITY = 0.85
+CONFIDENT_TITLE_SIMILARITY = 0.97
+
+# DOIs per filter query; longer filter lists risk "414 URI Too Long" responses.
+DOI_BATCH_SIZE = 20
+
+# Response cache lifetimes (seconds). Empty answers expire sooner: the record may appear later.
+CROSSREF_CACHE_TTL = 30 * 24 * 3600
+CROSSREF_CACHE_MISS_TTL = 7 * 24 * 3600
+
 def get_authors_list(entry):
     """
     Get a list of authors from a bib entry. 
@@ -25,19 +185,29 @@ def get_authors_list(entry):
             last_names.append(auth.strip())
     return last_names
 
+@functools.lru_cache(maxsize=8192)
+def _transliterate(text):
+    return unidecode(text)
+
+def _to_ascii(text):
+    # Journal and author names repeat across entries and candidates; memoize the
+    # transliteration. ASCII input passes through without touching the cache.
+    return text if text.isascii() else _transliterate(text)
+
 def normalize_text(text):
     if not text:
         return ""
-    text = unidecode(text)
-    text = re.sub(r"\s+", " ", text)
-    return text.strip().lower()
+    text = _to_ascii(text)
+    # split() with no argument drops the same whitespace as \s+ and trims both ends.
+    return " ".join(text.split()).lower()
 
 def normalize_author(author):
     if not author:
         return ""
     author = normalize_text(author)
-    author = re.sub(r"[^a-z0-9]", "", author)
-    return author
+    if author.isalnum():
+        return author
+    return author.translate(_AUTHOR_DELETE)
 
 def extract_item_year(item):
     for key in ("issued", "published-print", "published-online"):
@@ -46,22 +216,26 @@ def extract_item_year(item):
             return str(date_parts[0][0])
     return ""
 
+def title_match_key(title):
+    # default_process lowercases and strips punctuation; unidecode folds accents first.
+    return utils.default_process(_to_ascii(title))
+
 def title_similarity(a, b):
-    return SequenceMatcher(None, normalize_text(a), normalize_text(b)).ratio()
+    return fuzz.ratio(title_match_key(a), title_match_key(b)) / 100.0
 
 def normalize_doi(doi):
     if not doi:
         return ""
     doi = doi.strip().lower()
-    doi = re.sub(r"^(https?://(dx\.)?doi\.org/)", "", doi, flags=re.IGNORECASE)
-    doi = re.sub(r"^doi:\s*", "", doi, flags=re.IGNORECASE)
+    doi = _DOI_URL_RE.sub("", doi)
+    doi = _DOI_PREFIX_RE.sub("", doi)
     return doi
 
 def is_valid_doi(doi):
     doi = normalize_doi(doi)
     if not doi:
         return False
-    return re.match(r"^10\.\d{4,9}/\S+$", doi) is not None
+    return _DOI_VALID_RE.match(doi) is not None
 
 def normalize_container(item):
     container = item.get("container-title", [""])
@@ -72,158 +246,337 @@ def normalize_container(item):
 def normalize_pages(pages):
     if not pages:
         return ""
-    return re.sub(r"[^0-9\-]", "", pages)
+    return _PAGES_RE.sub("", pages)
 
 def item_fields_match(entry, item):
-    entry_journal = normalize_text(entry.get("journal", "")) or normalize_text(entry.get("booktitle", ""))
-    item_journal = normalize_container(item)
-    if entry_journal and item_journal and entry_journal != item_journal:
-        return False, "journal mismatch"
-
-    entry_volume = normalize_text(entry.get("volume", ""))
-    item_volume = normalize_text(item.get("volume", ""))
-    if entry_volume and item_volume and entry_volume != item_volume:
-        return False, "volume mismatch"
-
-    entry_issue = normalize_text(entry.get("number", ""))
-    item_issue = normalize_text(item.get("issue", ""))
-    if entry_issue and item_issue and entry_issue != item_issue:
-        return False, "issue mismatch"
-
-    entry_pages = normalize_pages(entry.get("pages", ""))
-    item_pages = normalize_pages(item.get("page", ""))
-    if entry_pages and item_pages and entry_pages != item_pages:
-        return False, "pages mismatch"
+    # Item fields are only normalized when the entry has a value to compare against.
+    get_entry = entry.get
+    get_item = item.get
+
+    entry_journal = normalize_text(get_entry("journal", "")) or normalize_text(get_entry("booktitle", ""))
+    if entry_journal:
+        item_journal = normalize_container(item)
+        if item_journal and entry_journal != item_journal:
+            return False, "journal mismatch"
+
+    entry_volume = normalize_text(get_entry("volume", ""))
+    if entry_volume:
+        item_volume = normalize_text(get_item("volume", ""))
+        if item_volume and entry_volume != item_volume:
+            return False, "volume mismatch"
+
+    entry_issue = normalize_text(get_entry("number", ""))
+    if entry_issue:
+        item_issue = normalize_text(get_item("issue", ""))
+        if item_issue and entry_issue != item_issue:
+            return False, "issue mismatch"
+
+    entry_pages = normalize_pages(get_entry("pages", ""))
+    if entry_pages:
+        item_pages = normalize_pages(get_item("page", ""))
+        if item_pages and entry_pages != item_pages:
+            return False, "pages mismatch"
 
     return True, ""
 
-def item_has_author_match(item, authors):
+def normalize_author_set(authors):
+    """Normalized last names for item_has_author_match, or None if there are no authors."""
     if not authors:
+        return None
+    return {normalize_author(a) for a in authors if a}
+
+def item_has_author_match(item, normalized_authors):
+    if normalized_authors is None:
         return True
     item_authors = item.get("author", [])
     if not item_authors:
         return True
-    normalized_authors = {normalize_author(a) for a in authors if a}
     for author in item_authors:
         family = normalize_author(author.get("family", ""))
         if family and family in normalized_authors:
             return True
     return False
 
-def search_doi(title, authors, year, entry=None, verify_log=None, entry_id=None):
+def crossref_query_params(title, authors):
+    """Query parameters for a Crossref title search; equal params mean an identical request."""
+    # Clean title for search
+    clean_title = _to_ascii(title).replace('{', '').replace('}', '')
+    
+    params = {
+        "query.title": clean_title,
+        "rows": 5,
+    }
+    if authors:
+        params["query.author"] = _to_ascii(authors[0])
+    return params
+
+def fetch_crossref_items(title, authors, session=None, errors=None):
+    """
+    Query the Crossref /works endpoint for candidate items.
+    Args:
+        title (str): Title of the paper.
+        authors (list[str]): Author last names; the first one narrows the query.
+        session (requests.Session): Session to use instead of the shared module session.
+        errors (list): Collects a failure message instead of logging it.
+    Returns:
+        list[dict]: Candidate items in Crossref relevance order, or None if the request failed.
+    """
+    # https://github.com/CrossRef/rest-api-doc
+    # Using the /works endpoint with query parameters
+    message = _crossref_get(crossref_query_params(title, authors), session=session, errors=errors)
+    if message is None:
+        return None
+    return message.get('items', [])
+
+def _doi_batches(dois):
+    """Distinct normalized DOIs, in lists of up to DOI_BATCH_SIZE for one filter query each."""
+    # Commas separate filter values, so DOIs containing one cannot be batched.
+    unique_dois = sorted({normalize_doi(d) for d in dois if d and "," not in d})
+    return [unique_dois[start:start + DOI_BATCH_SIZE] for start in range(0, len(unique_dois), DOI_BATCH_SIZE)]
+
+def fetch_items_by_dois(dois, session=None, errors=None):
+    """
+    Resolve known DOIs with Crossref filter queries, DOI_BATCH_SIZE DOIs per request.
+    Args:
+        dois (list[str]): DOIs to look up.
+        session (requests.Session): Session to use instead of the shared module session.
+        errors (list): Collects failure messages instead of logging them.
+    Returns:
+        dict: Normalized DOI -> Crossref item, for the DOIs Crossref returned.
+    """
+    found = {}
+    for chunk in _doi_batches(dois):
+        params = {
+            "filter": ",".join(f"doi:{doi}" for doi in chunk),
+            "rows": len(chunk),
+        }
+        message = _crossref_get(params, session=session, errors=errors)
+        if message is None:
+            continue
+        items = message.get('items', [])
+        for item in items:
+            doi = normalize_doi(item.get("DOI", ""))
+            if doi:
+                found[doi] = item
+    return found
+
+def _verify_known_dois(known, found, verify_log):
+    """Log whether each entry's existing DOI resolves and agrees with the entry."""
+    for entry, doi in known:
+        item = found.get(doi)
+        if item is None:
+            verify_log.append(f"- {entry['ID']}: existing DOI {doi} not returned by Crossref")
+            continue
+        fields_match, reason = item_fields_match(entry, item)
+        if fields_match:
+            verify_log.append(f"- {entry['ID']}: existing DOI {doi} confirmed")
+        else:
+            verify_log.append(f"- {entry['ID']}: existing DOI {doi} {reason}")
+
+def match_crossref_items(items, title, authors, year, entry=None, verify_log=None, entry_id=None):
+    """
+    Pick the best Crossref candidate for an entry, entirely offline.
+    Candidates must pass the title, author, year and (if `entry` is given) field checks.
+    Returns the normalized DOI of the best candidate, or None.
+    """
+    best_match = None
+    best_score = 0.0
+    # The entry side of each comparison is the same for every candidate.
+    normalized_authors = normalize_author_set(authors)
+    title_key = title_match_key(title)
+    # Cheapest checks first, so rejected candidates never reach the title comparison.
+    for item in items:
+        found_title = (item.get("title") or [""])[0]
+        item_year = extract_item_year(item)
+        if year and item_year and year != item_year:
+            if verify_log is not None and entry_id:
+                verify_log.append(f"- {entry_id}: reject year mismatch ({year} vs {item_year})")
+            continue
+        if not item_has_author_match(item, normalized_authors):
+            if verify_log is not None and entry_id:
+                verify_log.append(f"- {entry_id}: reject author mismatch ({found_title[:80]}...)")
+            continue
+        if entry is not None:
+            fields_match, reason = item_fields_match(entry, item)
+            if not fields_match:
+                if verify_log is not None and entry_id:
+                    verify_log.append(f"- {entry_id}: reject {reason} ({found_title[:80]}...)")
+                continue
+        score = fuzz.ratio(title_key, title_match_key(found_title)) / 100.0
+        if score < MIN_TITLE_SIMILARITY:
+            if verify_log is not None and entry_id:
+                verify_log.append(f"- {entry_id}: reject title similarity {score:.2f} ({found_title[:80]}...)")
+            continue
+        if score > best_score:
+            best_score = score
+            best_match = item
+            # Items come in relevance order; a near-exact title will not be beaten.
+            if score >= CONFIDENT_TITLE_SIMILARITY:
+                break
+    if best_match:
+        doi = best_match.get("DOI")
+        if doi and is_valid_doi(doi):
+            if verify_log is not None and entry_id:
+                verify_log.append(f"- {entry_id}: accept DOI {normalize_doi(doi)} (score {best_score:.2f})")
+            return normalize_doi(doi)
+        if verify_log is not None and entry_id:
+            verify_log.append(f"- {entry_id}: reject invalid DOI format ({doi})")
+    return None
+
+def search_doi(title, authors, year, entry=None, verify_log=None, entry_id=None, session=None):
     """
     Search for a DOI using Crossref API.
     Args:
         title (str): Title of the paper.
         authors (list[str]): Author last names.
         year (str): Year of publication.
+        session (requests.Session): Session to use instead of the shared module session.
     """
-    # https://github.com/CrossRef/rest-api-doc
-    # Using the /works endpoint with query parameters
-    
     if not title:
         return None
 
-    # Clean title for search
-    clean_title = unidecode(title).replace('{', '').replace('}', '')
-    
-    url = "https://api.crossref.org/works"
-    params = {
-        "query.title": clean_title,
-        "rows": 5,
-    }
-    if authors:
-        params["query.author"] = unidecode(authors[0])
-        
-    headers = {
-        'User-Agent': 'BibFixer/1.0 (mailto:agent@example.com)' 
-    }
-    
-    try:
-        response = requests.get(url, params=params, headers=headers, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            items = data.get('message', {}).get('items', [])
-            if items:
-                best_match = None
-                best_score = 0.0
-                for item in items:
-                    found_title = item.get("title", [""])[0]
-                    score = title_similarity(title, found_title)
-                    if score < 0.85:
-                        if verify_log is not None and entry_id:
-                            verify_log.append(f"- {entry_id}: reject title similarity {score:.2f} ({found_title[:80]}...)")
-                        continue
-                    if not item_has_author_match(item, authors):
-                        if verify_log is not None and entry_id:
-                            verify_log.append(f"- {entry_id}: reject author mismatch ({found_title[:80]}...)")
-                        continue
-                    item_year = extract_item_year(item)
-                    if year and item_year and year != item_year:
-                        if verify_log is not None and entry_id:
-                            verify_log.append(f"- {entry_id}: reject year mismatch ({year} vs {item_year})")
-                        continue
-                    if entry is not None:
-                        fields_match, reason = item_fields_match(entry, item)
-                        if not fields_match:
-                            if verify_log is not None and entry_id:
-                                verify_log.append(f"- {entry_id}: reject {reason} ({found_title[:80]}...)")
-                            continue
-                    if score > best_score:
-                        best_score = score
-                        best_match = item
-                if best_match:
-                    doi = best_match.get("DOI")
-                    if doi and is_valid_doi(doi):
-                        if verify_log is not None and entry_id:
-                            verify_log.append(f"- {entry_id}: accept DOI {normalize_doi(doi)} (score {best_score:.2f})")
-                        return normalize_doi(doi)
-                    if verify_log is not None and entry_id:
-                        verify_log.append(f"- {entry_id}: reject invalid DOI format ({doi})")
-                # else:
-                #     print(f"Rejected match: '{title}' vs '{found_title}' (Ratio: {ratio:.2f})")
-    except Exception as e:
-        # print(f"Error fetching DOI for {title}: {e}")
-        pass
-        
-    return None
+    items = fetch_crossref_items(title, authors, session=session)
+    if not items:
+        return None
+    return match_crossref_items(
+        items,
+        title,
+        authors,
+        year,
+        entry=entry,
+        verify_log=verify_log,
+        entry_id=entry_id,
+    )
 
-def enrich_database(database, pbar=None, verify=False):
+def _entry_query(entry):
+    """Return the (title, authors, year) used to look an entry up in Crossref."""
+    get = entry.get
+    title = get('title', '')
+    authors = get_authors_list(entry)
+    year_raw = get("year", "")
+    year_match = _YEAR_RE.search(year_raw)
+    year = year_match.group(0) if year_match else ""
+    return title, authors, year
+
+def crossref_cache_key(title, authors, year):
+    """Stable cache key for a Crossref lookup of (title, first author, year)."""
+    first_author = normalize_author(authors[0]) if authors else ""
+    raw = f"{normalize_text(title)}|{first_author}|{year}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+def enrich_database(database, pbar=None, verify=False, workers=DEFAULT_WORKERS, session=None,
+                    cache=None, refresh_cache=False):
     """
     Iterate over the database and find missing DOIs.
+    Crossref requests are network-bound, so they run concurrently on `workers` threads;
+    candidates are matched against the entries on the calling thread, in input order.
+    Lookups share a pooled module-level session unless `session` is given.
+    Pass a `cache` (see bibfixer.cache.JsonCache) to reuse Crossref responses from
+    earlier runs; with `refresh_cache`, every entry is queried again and the cache updated.
+    With `verify`, DOIs already present are also resolved in batches and checked.
     """
+    global _mailto_warned
+    if not MAILTO and not _mailto_warned:
+        _mailto_warned = True
+        logger.warning(
+            "BIBFIXER_MAILTO is not set; Crossref lookups use the anonymous pool with lower rate limits. "
+            "Set it to your email address to use the polite pool."
+        )
+
+    if session is None and workers > SESSION_POOL_SIZE:
+        # More threads than pooled connections would open and drop a connection per request.
+        session = create_session(pool_size=workers)
+
     items_modified = []
     verify_log = []
-    total = len(database.entries)
-    
-    iterator = database.entries
-    if pbar:
-        iterator = pbar(database.entries, desc="Enriching DOIs")
-        
-    for entry in iterator:
-        if "doi" not in entry or not entry["doi"].strip():
-            # Try to find DOI
-            title = entry.get('title', '')
-            authors = get_authors_list(entry)
-            year_raw = entry.get("year", "")
-            year_match = re.search(r"\d{4}", year_raw)
-            year = year_match.group(0) if year_match else ""
-            
-            # Rate limiting / politeness sleep if needed (Crossref is generous but good practice)
-            # time.sleep(0.1) 
-            
-            found_doi = search_doi(
-                title,
-                authors,
-                year,
-                entry=entry,
-                verify_log=verify_log if verify else None,
-                entry_id=entry.get("ID", ""),
-            )
-            if found_doi:
-                # Store old value just in case? already checked it was empty.
-                entry['doi'] = found_doi
-                # Record the change: (ID, added_doi)
-                items_modified.append((entry['ID'], found_doi))
-                
+
+    pending = []
+    known = []
+    for entry in database.entries:
+        doi = entry.get("doi", "")
+        if doi.strip():
+            if verify and is_valid_doi(doi):
+                known.append((entry, normalize_doi(doi)))
+            continue
+        title, authors, year = _entry_query(entry)
+        if not title:
+            continue
+        key = crossref_cache_key(title, authors, year) if cache is not None else None
+        pending.append((entry, title, authors, year, key))
+
+    # Candidate items per pending index; None means Crossref could not be reached.
+    results = {}
+    cached = set()
+    to_fetch = []
+    for idx, (_, _, _, _, key) in enumerate(pending):
+        items = cache.get(key) if key and not refresh_cache else None
+        if items is None:
+            to_fetch.append(idx)
+        else:
+            results[idx] = items
+            cached.add(idx)
+
+    # Failed requests are summarized once below rather than logged one by one.
+    errors = []
+    sent = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        # Existing DOIs are only checked in verify mode, in batches alongside the title searches.
+        known_future = None
+        if known:
+            known_dois = [doi for _, doi in known]
+            sent += len(_doi_batches(known_dois))
+            known_future = executor.submit(fetch_items_by_dois, known_dois, session=session, errors=errors)
+        # Entries that would send the same query (e.g. a preprint and its published
+        # version) share a single request.
+        queries = {}
+        for idx in to_fetch:
+            query = tuple(crossref_query_params(pending[idx][1], pending[idx][2]).items())
+            queries.setdefault(query, []).append(idx)
+        futures = {
+            executor.submit(
+                fetch_crossref_items, pending[idxs[0]][1], pending[idxs[0]][2], session=session, errors=errors,
+            ): idxs
+            for idxs in queries.values()
+        }
+        sent += len(futures)
+        completed = as_completed(futures)
+        if pbar:
+            completed = pbar(completed, total=len(futures), desc="Enriching DOIs")
+        for future in completed:
+            items = future.result()
+            for idx in futures[future]:
+                results[idx] = items
+
+        found_by_doi = known_future.result() if known_future is not None else {}
+
+    if errors:
+        logger.warning("%d of %d Crossref requests failed; first error: %s", len(errors), sent, errors[0])
+
+    if known:
+        _verify_known_dois(known, found_by_doi, verify_log)
+
+    # Apply results in input order so the report and verify log stay deterministic.
+    for idx, (entry, title, authors, year, key) in enumerate(pending):
+        items = results[idx]
+        if items is None:
+            continue
+        if key and idx not in cached:
+            cache.set(key, items, expire=CROSSREF_CACHE_TTL if items else CROSSREF_CACHE_MISS_TTL)
+        if verify and idx in cached:
+            verify_log.append(f"- {entry['ID']}: using cached Crossref response ({len(items)} candidates)")
+        found_doi = match_crossref_items(
+            items,
+            title,
+            authors,
+            year,
+            entry=entry,
+            verify_log=verify_log if verify else None,
+            entry_id=entry.get("ID", ""),
+        )
+        if found_doi:
+            # Store old value just in case? already checked it was empty.
+            entry['doi'] = found_doi
+            # Record the change: (ID, added_doi)
+            items_modified.append((entry['ID'], found_doi))
+
     return database, items_modified, verify_log
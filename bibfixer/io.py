@@ -1,14 +1,17 @@
 import bibtexparser
+from bibtexparser.bibdatabase import BibDatabase
 from bibtexparser.bparser import BibTexParser
 from bibtexparser.bwriter import BibTexWriter
 import os
+from .deduplicator import PRIVATE_FIELD_PREFIX
 
-def load_bib(path):
+def load_bib(path, customization=None):
     """
     Load a bibliography file.
     
     Args:
         path (str): Path to the .bib file.
+        customization (callable): Optional function applied to each entry as it is parsed.
         
     Returns:
         bibtexparser.bibdatabase.BibDatabase: The parsed bibliography database.
@@ -17,16 +20,23 @@ def load_bib(path):
         raise FileNotFoundError(f"File not found: {path}")
         
     with open(path, 'r', encoding='utf-8') as bibfile:
-        parser = BibTexParser(common_strings=True)
+        parser = BibTexParser(common_strings=True, customization=customization)
         parser.ignore_nonstandard_types = False
         parser.homogenise_fields = False  # Keep original fields as much as possible
         bib_database = bibtexparser.load(bibfile, parser=parser)
         
     return bib_database
 
+def _public_fields(entry):
+    """`entry` without the scratch fields deduplication stores on it."""
+    if not any(key.startswith(PRIVATE_FIELD_PREFIX) for key in entry):
+        return entry
+    return {key: value for key, value in entry.items() if not key.startswith(PRIVATE_FIELD_PREFIX)}
+
 def save_bib(database, path):
     """
     Save a bibliography database to a file.
+    Scratch fields left on entries by deduplication are never written.
     
     Args:
         database (bibtexparser.bibdatabase.BibDatabase): The bibliography database.
@@ -34,5 +44,16 @@ def save_bib(database, path):
     """
     writer = BibTexWriter()
     writer.indent = '  ' # 2 spaces indent
+    entries = database.entries
+    if writer.order_entries_by:
+        entries = sorted(entries, key=lambda entry: BibDatabase.entry_sort_key(entry, writer.order_entries_by))
     with open(path, 'w', encoding='utf-8') as bibfile:
-        bibfile.write(writer.write(database))
+        # Same output as writer.write(database), but entries are serialized one at a
+        # time instead of being joined into a single string for the whole file.
+        bibfile.write(writer._comments_to_bibtex(database))
+        bibfile.write(writer._preambles_to_bibtex(database))
+        bibfile.write(writer._strings_to_bibtex(database))
+        for i, entry in enumerate(entries):
+            if i:
+                bibfile.write(writer.entry_separator)
+            bibfile.write(writer._entry_to_bibtex(_public_fields(entry)))
@@ -1,18 +1,15 @@
 import re
 
+# A % starts a comment unless it is escaped as \%.
+_COMMENT_RE = re.compile(r"(?<!\\)%[^\n]*")
+# \cite variants and \nocite in one pass; group 1 is set for \nocite, group 2 holds the keys.
+_CITE_RE = re.compile(
+    r"\\(?:(nocite)|cite[a-zA-Z*]*)\s*(?:\[[^\]]*\]\s*){0,2}\{([^}]*)\}",
+    re.DOTALL,
+)
+
 def strip_tex_comments(text):
-    lines = []
-    for line in text.splitlines():
-        cleaned = []
-        i = 0
-        while i < len(line):
-            char = line[i]
-            if char == "%" and (i == 0 or line[i - 1] != "\\"):
-                break
-            cleaned.append(char)
-            i += 1
-        lines.append("".join(cleaned))
-    return "\n".join(lines)
+    return _COMMENT_RE.sub("", text)
 
 def extract_citation_keys(tex_path):
     """
@@ -24,50 +21,39 @@ def extract_citation_keys(tex_path):
 
     text = strip_tex_comments(text)
 
-    cite_re = re.compile(
-        r"\\cite[a-zA-Z*]*\s*(\[[^\]]*\]\s*){0,2}\{([^}]*)\}",
-        re.DOTALL,
-    )
-    nocite_re = re.compile(
-        r"\\nocite\s*(\[[^\]]*\]\s*){0,2}\{([^}]*)\}",
-        re.DOTALL,
-    )
-
     include_all = False
     keys = set()
 
-    for match in nocite_re.finditer(text):
-        raw = match.group(2)
-        for key in raw.split(","):
+    for match in _CITE_RE.finditer(text):
+        is_nocite = match.group(1) is not None
+        for key in match.group(2).split(","):
             cleaned = key.strip()
-            if cleaned == "*":
+            if is_nocite and cleaned == "*":
                 include_all = True
             elif cleaned:
                 keys.add(cleaned)
 
-    for match in cite_re.finditer(text):
-        raw = match.group(2)
-        for key in raw.split(","):
-            cleaned = key.strip()
-            if cleaned:
-                keys.add(cleaned)
-
     return keys, include_all
 
 def filter_database_by_keys(database, keys, include_all=False):
     """
     Filter bibliography entries by citation keys.
-    Returns (database, missing_keys).
+    Returns (database, missing_keys); missing_keys is an unordered set.
     """
     if include_all:
-        return database, []
+        return database, set()
 
     keys_set = set(keys)
     if not keys_set:
         database.entries = []
-        return database, []
-
-    existing_keys = {entry["ID"] for entry in database.entries}
-    missing = sorted(keys_set - existing_keys)
-    database.entries = [entry for entry in database.entries if entry["ID"] in keys_set]
-    return database, missing
+        return database, set()
+
+    kept = []
+    existing = set()
+    for entry in database.entries:
+        entry_id = entry["ID"]
+        existing.add(entry_id)
+        if entry_id in keys_set:
+            kept.append(entry)
+    database.entries = kept
+    return database, keys_set - existing
@@ -1,4 +1,4 @@
-from collections import Counter
+from collections import defaultdict
 
 def check_duplicates(database):
     """
@@ -6,19 +6,19 @@ def check_duplicates(database):
     Returns a list of warnings.
     """
     warnings = []
-    doi_map = {}
-    title_map = {}
+    doi_map = defaultdict(list)
+    title_map = defaultdict(list)
 
+    # One pass over the entries feeds both maps.
     for entry in database.entries:
-        doi = entry.get("doi", "").strip().lower()
+        get = entry.get
+        entry_id = entry["ID"]
+        doi = get("doi", "").strip().lower()
         if doi:
-            doi_map.setdefault(doi, []).append(entry["ID"])
-
-        title = entry.get("title", "").strip().lower()
-        year = entry.get("year", "").strip().lower()
+            doi_map[doi].append(entry_id)
+        title = get("title", "").strip().lower()
         if title:
-            title_key = (title, year)
-            title_map.setdefault(title_key, []).append(entry["ID"])
+            title_map[(title, get("year", "").strip().lower())].append(entry_id)
 
     for doi, ids in doi_map.items():
         if len(ids) > 1:
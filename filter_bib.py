@@ -9,8 +9,7 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from bibfixer.io import load_bib, save_bib
 from bibfixer.texfilter import extract_citation_keys, filter_database_by_keys
 
-
-import difflib
+from rapidfuzz import fuzz, process
 
 def main():
     parser = argparse.ArgumentParser(
@@ -59,9 +58,14 @@ def main():
         report_lines.append("\n## Missing Citations")
         report_lines.append("The following keys are cited in the .tex file but found no match in the .bib file:")
         
-        for key in missing:
+        # Sorted once so suggestions with equal scores come out in a stable order.
+        candidate_keys = tuple(sorted(available_keys))
+        for key in sorted(missing):
             # Fuzzy match
-            matches = difflib.get_close_matches(key, available_keys, n=3, cutoff=0.6)
+            matches = [
+                match for match, _, _ in
+                process.extract(key, candidate_keys, scorer=fuzz.ratio, limit=3, score_cutoff=60)
+            ]
             report_lines.append(f"\n- **{key}**")
             if matches:
                 report_lines.append(f"  - *Did you mean?* {', '.join(matches)}")